@@ -19,15 +19,29 @@ Webhook payload (from real Lipana docs):
 """
 
 import os
+import gzip
 import hmac
 import hashlib
-import json
 import logging
-import requests
-
-from flask import Flask, request, jsonify, send_from_directory
+import queue
+import re
+import sqlite3
+import threading
+import time
+import httpx
+import orjson
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, Response, request, send_from_directory
 from dotenv import load_dotenv
 
+from runtime_checks import check_runtime_build, check_sha_acceleration
+
+try:
+    import ijson  # optional: stream-decode Lipana list pages
+except ImportError:
+    ijson = None
+
 load_dotenv()
 
 # ─────────────────────────────────────────────
@@ -42,9 +56,19 @@ LIPANA_API_BASE       = "https://api.lipana.dev/v1"
 # If not set, the server will try to auto-detect from a running ngrok tunnel.
 WEBHOOK_PUBLIC_URL    = os.getenv("WEBHOOK_PUBLIC_URL", "").rstrip("/")
 
-# In-memory store: transactionId → { status, phone, amount }
+# SQLite ledger shared by all workers: transactionId → { status, phone, amount }
 # status values: "pending" | "success" | "failed"
-payment_store: dict[str, dict] = {}
+PAYMENT_DB_PATH       = os.getenv("PAYMENT_DB_PATH", "payments.db")
+# Rows untouched for longer than this are pruned from the ledger
+PAYMENT_RETENTION_HOURS = float(os.getenv("PAYMENT_RETENTION_HOURS", 24))
+
+# Short-lived cache of Lipana list-scan results: transactionId → (expiry, { status })
+# Every id seen on a scanned page is cached, so repeat recovery polls for any
+# of them skip the list fetch entirely.
+STATUS_CACHE_TTL     = 5     # seconds an entry is served
+STATUS_CACHE_SWEEP   = 500   # writes between sweeps of expired entries
+_status_cache: dict[str, tuple[float, dict]] = {}
+_status_cache_writes = 0
 
 # ─────────────────────────────────────────────
 # App Setup
@@ -58,44 +82,349 @@ log = logging.getLogger(__name__)
 app = Flask(__name__, static_folder="public", static_url_path="")
 
 
+# ─────────────────────────────────────────────
+# Payment Store
+# ─────────────────────────────────────────────
+class PaymentStore:
+    """
+    SQLite (WAL mode) payment ledger.
+    Survives restarts and is shared across Gunicorn workers, so a poll served
+    by one worker sees payments initiated or confirmed through another.
+
+    Each process holds a single connection guarded by a lock rather than one
+    connection per thread: under gevent workers threading.local is
+    greenlet-local, which would open a new connection for every request.
+    The lock is gevent-cooperative once patched, so in-process writers queue
+    without blocking the hub; WAL keeps cross-worker writes short, and readers
+    never wait on them. Writes that read first run inside BEGIN IMMEDIATE so
+    concurrent webhook and poll updates can't interleave.
+    """
+
+    def __init__(self, path: str):
+        self.path  = path
+        self._lock = threading.Lock()
+        self._db   = sqlite3.connect(path, timeout=10, isolation_level=None,
+                                     check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS payments ("
+            "  transaction_id TEXT PRIMARY KEY,"
+            "  status         TEXT NOT NULL,"
+            "  phone          TEXT,"
+            "  amount         REAL,"
+            "  updated_at     REAL NOT NULL"
+            ")"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_payments_status ON payments (status)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_payments_updated ON payments (updated_at)")
+        self.prune()
+
+    @staticmethod
+    def _record(row: tuple) -> dict:
+        status, phone, amount = row
+        # REAL column: restore whole amounts to int, but only within the
+        # 64-bit range orjson can serialise
+        if isinstance(amount, float) and amount.is_integer() and -2**63 <= amount < 2**63:
+            amount = int(amount)
+        return {"status": status, "phone": phone, "amount": amount}
+
+    def _get(self, transaction_id: str) -> dict | None:
+        row = self._db.execute(
+            "SELECT status, phone, amount FROM payments WHERE transaction_id = ?",
+            (transaction_id,),
+        ).fetchone()
+        return self._record(row) if row else None
+
+    def _prune(self) -> int:
+        cutoff = time.time() - PAYMENT_RETENTION_HOURS * 3600
+        cur = self._db.execute("DELETE FROM payments WHERE updated_at < ?", (cutoff,))
+        return cur.rowcount
+
+    def get(self, transaction_id: str) -> dict | None:
+        """Return { status, phone, amount } for transaction_id, or None."""
+        with self._lock:
+            return self._get(transaction_id)
+
+    def prune(self) -> int:
+        """Delete rows older than PAYMENT_RETENTION_HOURS. Returns rows removed."""
+        with self._lock:
+            return self._prune()
+
+    def add(self, transaction_id: str, record: dict) -> dict:
+        """
+        Insert record for transaction_id unless a row already exists (e.g. a
+        webhook got there first). Returns the row as actually stored.
+        Each new payment also prunes expired rows, keeping the ledger bounded.
+        """
+        with self._lock:
+            self._prune()
+            self._db.execute(
+                "INSERT INTO payments VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(transaction_id) DO NOTHING",
+                (transaction_id, record["status"], record.get("phone"),
+                 record.get("amount"), time.time()),
+            )
+            return self._get(transaction_id) or record
+
+    def resolve_pending(self, transaction_id: str, status: str) -> bool:
+        """Set status only if the payment is still pending. Returns True if updated."""
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE payments SET status = ?, updated_at = ? "
+                "WHERE transaction_id = ? AND status = 'pending'",
+                (status, time.time(), transaction_id),
+            )
+            return cur.rowcount > 0
+
+    def record_webhook(self, transaction_id: str, status: str, phone: str, amount) -> bool:
+        """
+        Apply a webhook status: update an existing payment, or register it if
+        the webhook beat the initiating worker. Returns True if newly created.
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                exists = self._db.execute(
+                    "SELECT 1 FROM payments WHERE transaction_id = ?", (transaction_id,)
+                ).fetchone()
+                if exists:
+                    self._db.execute(
+                        "UPDATE payments SET status = ?, updated_at = ? WHERE transaction_id = ?",
+                        (status, time.time(), transaction_id),
+                    )
+                else:
+                    self._db.execute(
+                        "INSERT INTO payments VALUES (?, ?, ?, ?, ?)",
+                        (transaction_id, status, phone, amount, time.time()),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            return not exists
+
+    def items(self) -> list[tuple[str, dict]]:
+        """Return every (transaction_id, record) pair."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT transaction_id, status, phone, amount FROM payments"
+            ).fetchall()
+        return [(row[0], self._record(row[1:])) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM payments").fetchone()[0]
+
+
+payment_store = PaymentStore(PAYMENT_DB_PATH)
+
+
+# Verified webhook updates waiting to be written:
+# (transactionId, status, phone, amount). The webhook route only enqueues,
+# so Lipana gets its 2xx without waiting on the store.
+_webhook_queue: queue.Queue = queue.Queue()
+
+
+def _drain_webhook_queue() -> None:
+    """Background consumer: apply queued webhook updates to payment_store."""
+    while True:
+        transaction_id, resolved, phone, amount = _webhook_queue.get()
+        try:
+            created = payment_store.record_webhook(transaction_id, resolved, phone, amount)
+            if created:
+                # Payment arrived via webhook before a poll — register it now
+                log.info("Webhook registered new payment  id=%s", transaction_id)
+            else:
+                log.info("Payment store updated  id=%s  status=%s", transaction_id, resolved)
+        except Exception:
+            log.exception("Failed to apply webhook update  id=%s", transaction_id)
+        finally:
+            _webhook_queue.task_done()
+
+
+threading.Thread(target=_drain_webhook_queue, name="webhook-drain", daemon=True).start()
+
+
+# Last auto-detected webhook URL: (detected_at, url). Re-probed after the TTL
+# so a restarted ngrok tunnel is picked up without hitting its API per call.
+WEBHOOK_URL_CACHE_TTL = 60  # seconds
+_cached_webhook_url: tuple[float, str] | None = None
+
+
 def get_webhook_url() -> str:
     """Return the full public webhook URL, auto-detecting ngrok if needed."""
+    global _cached_webhook_url
     if WEBHOOK_PUBLIC_URL:
         return f"{WEBHOOK_PUBLIC_URL}/webhook"
+    if _cached_webhook_url and time.monotonic() - _cached_webhook_url[0] < WEBHOOK_URL_CACHE_TTL:
+        return _cached_webhook_url[1]
+
+    url = f"http://localhost:{PORT}/webhook  ⚠️  (not publicly reachable — set WEBHOOK_PUBLIC_URL)"
     # Try to read from a running ngrok agent API
     try:
-        resp = requests.get("http://localhost:4040/api/tunnels", timeout=3)
+        resp = httpx.get("http://localhost:4040/api/tunnels", timeout=3)
         tunnels = resp.json().get("tunnels", [])
         for t in tunnels:
             if t.get("proto") == "https":
-                return f"{t['public_url']}/webhook"
+                url = f"{t['public_url']}/webhook"
+                break
     except Exception:
         pass
-    return f"http://localhost:{PORT}/webhook  ⚠️  (not publicly reachable — set WEBHOOK_PUBLIC_URL)"
+    _cached_webhook_url = (time.monotonic(), url)
+    return url
 
 
 # ─────────────────────────────────────────────
 # Helpers
 # ─────────────────────────────────────────────
+def ojsonify(obj) -> Response:
+    """jsonify() equivalent that serialises with orjson instead of stdlib json."""
+    return app.response_class(orjson.dumps(obj), mimetype="application/json")
+
+
+# Responses smaller than this aren't worth the gzip header + CPU overhead
+GZIP_MIN_SIZE = 1024
+
+
+@app.after_request
+def gzip_response(response: Response) -> Response:
+    """Gzip larger dynamic responses (e.g. /webhook-info) for gzip-capable clients."""
+    if (
+        response.direct_passthrough            # static files streamed from disk
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+
+    # Eligible for compression: vary on Accept-Encoding even when this client
+    # gets the plain body, so shared caches never hand gzip to non-gzip clients.
+    response.vary.add("Accept-Encoding")
+    if "gzip" not in request.headers.get("Accept-Encoding", ""):
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=1))
+    response.headers["Content-Encoding"] = "gzip"
+    return response
+
+
 def lipana_headers() -> dict:
     """Return common Lipana API auth headers."""
     return {
-        "x-api-key": LIPANA_SECRET_KEY,
+        "x-api-key": LIPANA_SECRET_KEY or "",
         "Content-Type": "application/json",
+        # httpx transparently decompresses gzip, including streamed bodies
+        "Accept-Encoding": "gzip",
     }
 
 
+# Shared HTTP/2 client for Lipana API calls — keeps one multiplexed connection
+# to api.lipana.dev alive, so concurrent list-page fetches share it instead
+# of each opening their own TCP/TLS connection.
+# Transport retries only cover failed connects, so STK push POSTs are never resent.
+CLIENT = httpx.Client(
+    timeout=15.0,
+    headers=lipana_headers(),
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+    ),
+)
+
+
+# Pre-keyed HMAC: the secret never changes, so derive the ipad/opad state once
+# and .copy() it per webhook instead of re-encoding and re-keying every time.
+_SECRET_BYTES  = (LIPANA_WEBHOOK_SECRET or "").encode("utf-8")
+_HMAC_TEMPLATE = (
+    hmac.new(_SECRET_BYTES, b"", hashlib.sha256) if LIPANA_WEBHOOK_SECRET else None
+)
+
+
 def verify_webhook_signature(payload_bytes: bytes, signature: str) -> bool:
     """
     Verify HMAC-SHA256 webhook signature from Lipana.
     Uses the raw request body (before JSON parsing) per Lipana docs.
     """
-    expected = hmac.new(
-        LIPANA_WEBHOOK_SECRET.encode("utf-8"),
-        payload_bytes,
-        hashlib.sha256,
-    ).hexdigest()
-    return hmac.compare_digest(signature, expected)
+    if _HMAC_TEMPLATE is None:
+        log.error("LIPANA_WEBHOOK_SECRET is not set — cannot verify webhook")
+        return False
+    try:
+        sig_bytes = bytes.fromhex(signature.removeprefix("sha256="))
+    except ValueError:
+        return False  # not hex — can't be a valid signature
+    mac = _HMAC_TEMPLATE.copy()
+    mac.update(payload_bytes)
+    return len(sig_bytes) == mac.digest_size and hmac.compare_digest(sig_bytes, mac.digest())
+
+
+def parse_webhook_event(payload_bytes: bytes) -> tuple | None:
+    """
+    Decode a verified webhook body and pull out the fields we use.
+    Returns (event, transactionId, raw status, phone, amount), or None if
+    the body is not a JSON object.
+    """
+    try:
+        data = orjson.loads(payload_bytes)
+    except orjson.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    event_data = data.get("data")
+    if not isinstance(event_data, dict):
+        event_data = {}
+
+    # Per Lipana docs: data.transactionId is the primary identifier
+    transaction_id = event_data.get("transactionId") or event_data.get("transaction_id", "")
+    if not isinstance(transaction_id, str):
+        transaction_id = str(transaction_id) if isinstance(transaction_id, (int, float)) else ""
+
+    # data.status is the ground-truth status field in Lipana's payload
+    raw_status = event_data.get("status")
+    if not isinstance(raw_status, str):
+        raw_status = ""
+
+    phone = event_data.get("phone")
+    phone = phone.lstrip("+") if isinstance(phone, str) else ""
+
+    # The update is written after Lipana has had its 202, so only pass on
+    # values SQLite can bind — anything else would drop the status update.
+    amount = event_data.get("amount")
+    if isinstance(amount, bool) or not isinstance(amount, (int, float, str)):
+        amount = None
+    elif isinstance(amount, int) and not -2**63 <= amount < 2**63:
+        amount = str(amount)
+
+    return (
+        data.get("event", ""),                  # e.g. "payment.success"
+        transaction_id,
+        raw_status,
+        phone,
+        amount,
+    )
+
+
+# Leading "+" signs and trunk zeros stripped before prefixing the 254 country code
+_PHONE_PREFIX_RE = re.compile(r"^\+*0*")
+
+
+# Lipana status string → internal status. Lowercase and upper-case variants
+# are listed directly so the common inputs resolve without a .lower() copy.
+_STATUS_MAP = {
+    raw: internal
+    for internal, raws in (
+        ("success", ("success", "completed")),
+        ("failed",  ("failed", "failure", "cancelled", "canceled")),
+        ("pending", ("pending",)),
+    )
+    for base in raws
+    for raw in (base, base.upper(), base.capitalize())
+}
 
 
 def map_lipana_status(raw: str) -> str:
@@ -104,13 +433,187 @@ def map_lipana_status(raw: str) -> str:
     Lipana webhook data.status: "success" | "failed" | "pending"
     Lipana API transaction list status: "completed" | "failed" | "pending" etc.
     """
-    raw = (raw or "").lower().strip()
-    if raw in ("success", "completed"):
-        return "success"
-    elif raw in ("failed", "failure", "cancelled", "canceled"):
-        return "failed"
-    else:
+    if not raw:
         return "pending"
+    status = _STATUS_MAP.get(raw)
+    if status is None:
+        raw    = raw.strip()
+        status = _STATUS_MAP.get(raw) or _STATUS_MAP.get(raw.lower(), "pending")
+    return status
+
+
+def _cache_status(transaction_id: str, status: str) -> None:
+    """Remember a scanned transaction status for STATUS_CACHE_TTL seconds."""
+    global _status_cache_writes
+    now = time.monotonic()
+    _status_cache[transaction_id] = (now + STATUS_CACHE_TTL, {"status": status})
+
+    # Counter-based probe: occasionally drop expired entries so the cache
+    # stays bounded by recent traffic rather than growing forever.
+    _status_cache_writes += 1
+    if _status_cache_writes >= STATUS_CACHE_SWEEP:
+        _status_cache_writes = 0
+        for tid, (expiry, _) in list(_status_cache.items()):
+            if expiry < now:
+                _status_cache.pop(tid, None)
+
+
+def _cached_status(transaction_id: str) -> dict | None:
+    """Return a fresh cached status for transaction_id, if any."""
+    entry = _status_cache.get(transaction_id)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+
+# Upper bound on Lipana list pages scanned per lookup (≤300 records)
+LIPANA_MAX_PAGES = 3
+
+
+# Decode errors raised while reading a Lipana list page
+_PAGE_DECODE_ERRORS = (orjson.JSONDecodeError,) + ((ijson.JSONError,) if ijson else ())
+
+# Only stream-decode list pages whose body is larger than this. For normal
+# 100-record pages (~25 KB) a full orjson decode is several times faster.
+LIST_STREAM_MIN_BYTES = 1 << 20
+
+# ijson prefixes of one transaction in the list body (data may be nested)
+_ITEM_PREFIXES = ("data.item", "data.data.item")
+
+
+def _ijson_events(chunks):
+    """Yield ijson (prefix, event, value) tuples from an iterable of byte chunks."""
+    events = ijson.sendable_list()
+    coro   = ijson.parse_coro(events)
+    for chunk in chunks:
+        coro.send(chunk)
+        yield from events
+        del events[:]
+    coro.close()
+    yield from events
+
+
+def _stream_page_items(resp, transaction_id: str) -> tuple[list, int]:
+    """
+    Stream-decode a large list page with ijson, keeping only
+    transactionId/status per item and stopping as soon as transaction_id
+    has been read. Bounds memory; slower than orjson on typical pages.
+    """
+    items: list[dict] = []
+    total_pages = 1
+    item_prefix, id_key, status_key, current = "", "", "", None
+    for prefix, event, value in _ijson_events(resp.iter_bytes()):
+        if current is not None:
+            if prefix == id_key and event == "string":
+                current["transactionId"] = value
+            elif prefix == status_key and event == "string":
+                current["status"] = value
+            elif prefix == item_prefix and event == "end_map":
+                items.append(current)
+                if current.get("transactionId") == transaction_id:
+                    break  # match found — skip the rest of the page
+                current = None
+        elif event == "start_map" and prefix in _ITEM_PREFIXES:
+            item_prefix, current = prefix, {}
+            id_key, status_key = f"{prefix}.transactionId", f"{prefix}.status"
+        elif prefix == "pagination.pages" and event == "number":
+            total_pages = int(value)
+    return items, total_pages
+
+
+# Transient gateway errors retried on the (idempotent) list GET; httpx's
+# transport retries only cover failed connects.
+LIST_RETRY_STATUSES = (502, 503, 504)
+LIST_MAX_RETRIES    = 2
+LIST_RETRY_BACKOFF  = 0.1   # seconds, doubled per attempt
+
+
+def _fetch_transactions_page(page: int, transaction_id: str) -> tuple[list, int] | None:
+    """
+    Fetch one page of the Lipana transaction list.
+    Returns (items, total_pages) or None if Lipana answered with an error.
+    """
+    for attempt in range(LIST_MAX_RETRIES + 1):
+        with CLIENT.stream(
+            "GET",
+            f"{LIPANA_API_BASE}/transactions",
+            params={"limit": 100, "page": page},
+        ) as resp:
+            retry = resp.status_code in LIST_RETRY_STATUSES and attempt < LIST_MAX_RETRIES
+            if not retry:
+                if not resp.is_success:
+                    log.debug("Lipana list endpoint returned HTTP %s (page %s)",
+                              resp.status_code, page)
+                    return None
+
+                length = resp.headers.get("Content-Length", "")
+                if ijson is not None and length.isdigit() and int(length) > LIST_STREAM_MIN_BYTES:
+                    return _stream_page_items(resp, transaction_id)
+
+                body = orjson.loads(resp.read())
+                break
+
+        # Back off only after the failed response is closed, so it doesn't
+        # hold an HTTP/2 stream or pooled connection while we wait.
+        log.debug("Lipana list endpoint returned HTTP %s (page %s) — retrying",
+                  resp.status_code, page)
+        time.sleep(LIST_RETRY_BACKOFF * 2 ** attempt)
+
+    items = body.get("data", [])
+
+    # Normalise: data may be nested dict with inner data array
+    if isinstance(items, dict):
+        items = items.get("data", [])
+    if not isinstance(items, list):
+        items = []
+
+    total_pages = body.get("pagination", {}).get("pages", 1)
+    return items, total_pages
+
+
+def _scan_page(items: list, transaction_id: str) -> str | None:
+    """Cache every id on a page; return the raw status of our transaction."""
+    by_id = {
+        tx.get("transactionId"): tx
+        for tx in items
+        if isinstance(tx, dict) and tx.get("transactionId")
+    }
+    for tid, tx in by_id.items():
+        _cache_status(tid, map_lipana_status(tx.get("status", "")))
+
+    tx = by_id.get(transaction_id)
+    return tx.get("status", "") if tx is not None else None
+
+
+def _scan_pages_concurrently(pages, transaction_id: str) -> str | None:
+    """
+    Fetch and scan the given pages in parallel, stopping early on a match.
+    Returns the raw status of transaction_id, or None if not found.
+    """
+    stop = threading.Event()
+
+    def worker(page: int) -> str | None:
+        if stop.is_set():
+            return None
+        fetched = _fetch_transactions_page(page, transaction_id)
+        if fetched is None:
+            return None
+        return _scan_page(fetched[0], transaction_id)
+
+    # Per-call pool sized to the page count, so concurrent recovery polls
+    # never queue behind each other's page fetches.
+    pages = list(pages)
+    pool  = ThreadPoolExecutor(max_workers=len(pages), thread_name_prefix="lipana-page")
+    futures = [pool.submit(worker, page) for page in pages]
+    try:
+        for future in as_completed(futures):
+            found = future.result()
+            if found is not None:
+                return found
+        return None
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
 
 
 def fetch_lipana_status(transaction_id: str) -> dict | None:
@@ -122,54 +625,36 @@ def fetch_lipana_status(transaction_id: str) -> dict | None:
           The filter param ?transactionId= is also unreliable.
           We therefore fetch the list and scan for a matching transactionId.
 
+    Page 1 is fetched first to learn the page count; any further pages
+    (up to LIPANA_MAX_PAGES, ≤300 records) are fetched concurrently.
+
     Returns { status: 'success'|'failed'|'pending' } or None on error.
     """
+    cached = _cached_status(transaction_id)
+    if cached:
+        return cached
+
     try:
         # Fetch latest transactions (most recent first) and scan for our ID.
-        # Paginate up to 3 pages (≤300 records) to handle busier accounts.
-        page = 1
-        while page <= 3:
-            resp = requests.get(
-                f"{LIPANA_API_BASE}/transactions",
-                params={"limit": 100, "page": page},
-                headers=lipana_headers(),
-                timeout=15,
-            )
+        first = _fetch_transactions_page(1, transaction_id)
+        if first is None:
+            return None
+        items, total_pages = first
+        found = _scan_page(items, transaction_id)
 
-            if not resp.ok:
-                log.debug("Lipana list endpoint returned HTTP %s (page %s)",
-                          resp.status_code, page)
-                return None
-
-            body  = resp.json()
-            items = body.get("data", [])
-
-            # Normalise: data may be nested dict with inner data array
-            if isinstance(items, dict):
-                items = items.get("data", [])
-
-            if not isinstance(items, list) or not items:
-                break  # no more records
-
-            # Scan this page for our transaction
-            for tx in items:
-                if tx.get("transactionId") == transaction_id:
-                    raw_status = tx.get("status", "")
-                    log.info("Lipana list scan found  id=%s  raw_status=%s",
-                             transaction_id, raw_status)
-                    return {"status": map_lipana_status(raw_status)}
-
-            # Check if there are more pages
-            pagination = body.get("pagination", {})
-            total_pages = pagination.get("pages", 1)
-            if page >= total_pages:
-                break
-            page += 1
+        total_pages = min(LIPANA_MAX_PAGES, total_pages)
+        if found is None and items and total_pages > 1:
+            found = _scan_pages_concurrently(range(2, total_pages + 1), transaction_id)
+
+        if found is not None:
+            log.info("Lipana list scan found  id=%s  raw_status=%s",
+                     transaction_id, found)
+            return {"status": map_lipana_status(found)}
 
         log.debug("Transaction %s not found in Lipana list", transaction_id)
         return None
 
-    except requests.exceptions.RequestException as exc:
+    except (httpx.HTTPError, *_PAGE_DECODE_ERRORS) as exc:
         log.debug("fetch_lipana_status error: %s", exc)
         return None
 
@@ -216,19 +701,28 @@ def initiate_payment():
 
     # ── Validate inputs ──────────────────────
     if not phone:
-        return jsonify({"error": "Phone number is required"}), 400
+        return ojsonify({"error": "Phone number is required"}), 400
     if not amount:
-        return jsonify({"error": "Amount is required"}), 400
+        return ojsonify({"error": "Amount is required"}), 400
 
-    try:
-        amount = int(float(amount))
-        if amount < 10:
-            return jsonify({"error": "Minimum payment amount is KES 10"}), 400
-    except (ValueError, TypeError):
-        return jsonify({"error": "Amount must be a valid number"}), 400
+    # Plain ints (the usual JSON case) and digit strings skip the float roundtrip
+    if isinstance(amount, int) and not isinstance(amount, bool):
+        pass
+    elif isinstance(amount, str) and amount.isdecimal():
+        amount = int(amount)
+    else:
+        try:
+            amount = int(float(amount))
+        except (ValueError, TypeError, OverflowError):
+            return ojsonify({"error": "Amount must be a valid number"}), 400
+    if amount < 10:
+        return ojsonify({"error": "Minimum payment amount is KES 10"}), 400
+    if amount >= 2**63:
+        # Must fit the payment ledger's 64-bit column before we trigger a push
+        return ojsonify({"error": "Amount is too large"}), 400
 
     # Normalise phone: ensure +254XXXXXXXXX format
-    phone = phone.lstrip("+").lstrip("0")
+    phone = _PHONE_PREFIX_RE.sub("", phone, count=1)
     if not phone.startswith("254"):
         phone = "254" + phone
 
@@ -236,28 +730,30 @@ def initiate_payment():
 
     # ── Call Lipana API ──────────────────────
     try:
-        resp = requests.post(
+        resp = CLIENT.post(
             f"{LIPANA_API_BASE}/transactions/push-stk",
             json={"phone": f"+{phone}", "amount": amount},
-            headers=lipana_headers(),
             timeout=30,
         )
         resp.raise_for_status()
         result = resp.json()
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         log.error("Lipana API timed out")
-        return jsonify({"error": "Payment gateway timed out. Please try again."}), 504
-    except requests.exceptions.HTTPError as exc:
+        return ojsonify({"error": "Payment gateway timed out. Please try again."}), 504
+    except httpx.HTTPStatusError as exc:
         error_body = {}
         try:
             error_body = exc.response.json()
         except Exception:
             pass
         log.error("Lipana API error %s: %s", exc.response.status_code, error_body)
-        return jsonify({"error": error_body.get("message", "Payment initiation failed")}), 502
-    except requests.exceptions.RequestException as exc:
+        return ojsonify({"error": error_body.get("message", "Payment initiation failed")}), 502
+    except httpx.HTTPError as exc:
         log.error("Network error calling Lipana: %s", exc)
-        return jsonify({"error": "Could not reach payment gateway"}), 502
+        return ojsonify({"error": "Could not reach payment gateway"}), 502
+    except ValueError:
+        log.error("Lipana API returned a non-JSON response: %s", resp.text[:200])
+        return ojsonify({"error": "Unexpected response from payment gateway"}), 502
 
     # ── Extract transactionId (primary tracking key) ──
     data           = result.get("data", result)
@@ -271,17 +767,17 @@ def initiate_payment():
 
     if not transaction_id:
         log.error("Lipana response missing transactionId. Full response: %s", result)
-        return jsonify({"error": "Unexpected response from payment gateway"}), 502
+        return ojsonify({"error": "Unexpected response from payment gateway"}), 502
 
     # ── Store initial pending state ──────────
-    payment_store[transaction_id] = {
+    payment_store.add(transaction_id, {
         "status":  "pending",
         "phone":   phone,
         "amount":  amount,
-    }
+    })
     log.info("STK push queued  trackingId=%s", transaction_id)
 
-    return jsonify({"trackingId": transaction_id}), 200
+    return ojsonify({"trackingId": transaction_id}), 200
 
 
 # ─────────────────────────────────────────────
@@ -303,26 +799,29 @@ def check_status(tracking_id: str):
         live = fetch_lipana_status(tracking_id)
         if live:
             # Reconstruct the record from API data
-            payment_store[tracking_id] = {
+            record = payment_store.add(tracking_id, {
                 "status": live["status"],
                 "phone":  "Recovered",
                 "amount": 0 # Amount isn't critical for the status screen
-            }
-            record = payment_store[tracking_id]
+            })
         else:
-            return jsonify({"status": "not_found"}), 404
+            return ojsonify({"status": "not_found"}), 404
 
     # ── Active API poll while still pending ──
     if record["status"] == "pending":
         live = fetch_lipana_status(tracking_id)
         if live and live["status"] != "pending":
-            record["status"] = live["status"]
-            log.info(
-                "API poll resolved  id=%s  → status=%s",
-                tracking_id, record["status"],
-            )
-
-    return jsonify({
+            if payment_store.resolve_pending(tracking_id, live["status"]):
+                record["status"] = live["status"]
+                log.info(
+                    "API poll resolved  id=%s  → status=%s",
+                    tracking_id, record["status"],
+                )
+            else:
+                # A webhook resolved it first — report what the ledger holds
+                record = payment_store.get(tracking_id) or record
+
+    return ojsonify({
         "status": record["status"],
         "phone":  record.get("phone"),
         "amount": record.get("amount"),
@@ -338,7 +837,7 @@ def webhook_info():
     Diagnostic endpoint — returns the public webhook URL to register
     in the Lipana dashboard, plus pending/tracked transaction count.
     """
-    return jsonify({
+    return ojsonify({
         "webhook_url":          get_webhook_url(),
         "instruction":         "Register the webhook_url above in your Lipana dashboard → Webhooks settings",
         "tracked_transactions": len(payment_store),
@@ -353,56 +852,39 @@ def webhook_info():
 def webhook():
     """
     Receive Lipana payment webhook notifications.
-    Verifies HMAC-SHA256 signature before processing.
+    Verifies HMAC-SHA256 signature, then queues the update for the
+    background consumer and answers 202 immediately.
 
     Supported events (from Lipana docs):
         payment.success  →  data.status == "success"
         payment.failed   →  data.status == "failed"
         payment.pending  →  data.status == "pending"
     """
-    raw_payload = request.get_data()
+    raw_payload = request.get_data(cache=False, as_text=False)
 
     signature = request.headers.get("X-Lipana-Signature", "")
     if not signature:
         log.warning("Webhook received without X-Lipana-Signature header")
-        return jsonify({"error": "Missing signature"}), 401
+        return ojsonify({"error": "Missing signature"}), 401
 
     if not verify_webhook_signature(raw_payload, signature):
         log.warning("Webhook signature mismatch — possible spoofed request")
-        return jsonify({"error": "Invalid signature"}), 401
+        return ojsonify({"error": "Invalid signature"}), 401
 
-    try:
-        data = json.loads(raw_payload)
-    except json.JSONDecodeError:
-        return jsonify({"error": "Invalid JSON"}), 400
+    parsed = parse_webhook_event(raw_payload)
+    if parsed is None:
+        return ojsonify({"error": "Invalid JSON"}), 400
 
-    event      = data.get("event", "")          # e.g. "payment.success"
-    event_data = data.get("data", {})
-
-    # Per Lipana docs: data.transactionId is the primary identifier
-    transaction_id = event_data.get("transactionId") or event_data.get("transaction_id", "")
-
-    # data.status is the ground-truth status field in Lipana's payload
-    raw_status = event_data.get("status", "")
-    resolved   = map_lipana_status(raw_status)
+    event, transaction_id, raw_status, phone, amount = parsed
+    resolved = map_lipana_status(raw_status)
 
     log.info("Webhook  event=%s  id=%s  status=%s → %s",
              event, transaction_id, raw_status, resolved)
 
-    # ── Update payment store ──────────────────
-    if transaction_id in payment_store:
-        payment_store[transaction_id]["status"] = resolved
-        log.info("Payment store updated  id=%s  status=%s", transaction_id, resolved)
-    else:
-        # Payment arrived via webhook before a poll — register it now
-        payment_store[transaction_id] = {
-            "status": resolved,
-            "phone":  event_data.get("phone", "").lstrip("+"),
-            "amount": event_data.get("amount"),
-        }
-        log.info("Webhook registered new payment  id=%s", transaction_id)
+    # ── Hand off to the payment store consumer ──
+    _webhook_queue.put_nowait((transaction_id, resolved, phone, amount))
 
-    return jsonify({"received": True}), 200
+    return ojsonify({"received": True}), 202
 
 
 # ─────────────────────────────────────────────
@@ -415,6 +897,8 @@ if __name__ == "__main__":
         raise RuntimeError("LIPANA_WEBHOOK_SECRET is not set in .env")
 
     log.info("Starting Lipana payment server on port %s", PORT)
+    check_sha_acceleration(log)
+    check_runtime_build(log)
     log.info("Checkout page  →  http://localhost:%s", PORT)
     log.info("Webhook URL    →  %s  (register this in your Lipana dashboard)", get_webhook_url())
     log.info("Diagnostic     →  http://localhost:%s/webhook-info", PORT)
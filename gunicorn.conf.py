@@ -0,0 +1,26 @@
+"""
+Gunicorn settings for production (`gunicorn app:app` picks this file up).
+
+gevent workers make the blocking Lipana API calls cooperative, so one worker
+can keep hundreds of /status polls in flight instead of one per OS thread.
+The gevent worker monkey-patches socket/ssl/threading itself before app.py
+is imported, so app.py needs no gevent-specific code.
+"""
+
+import os
+
+from runtime_checks import check_runtime_build, check_sha_acceleration
+
+bind               = f"0.0.0.0:{os.getenv('PORT', 3000)}"
+workers            = int(os.getenv("WEB_CONCURRENCY", 4))
+worker_class       = "gevent"
+worker_connections = 1000
+# Outbound Lipana calls can take up to 30 s (STK push), plus headroom.
+timeout            = 60
+accesslog          = "-"
+
+
+def on_starting(server):
+    """Run the deploy-time self-checks once, in the master process."""
+    check_sha_acceleration(server.log)
+    check_runtime_build(server.log)
@@ -0,0 +1,49 @@
+"""
+Startup self-checks for the deployment environment.
+
+Kept free of side effects so both `python app.py` and the Gunicorn master
+(via gunicorn.conf.py, before any worker imports app.py) can run them.
+"""
+
+import hashlib
+import logging
+import os
+import ssl
+import sysconfig
+
+
+def check_sha_acceleration(log: logging.Logger) -> None:
+    """
+    Startup self-check for hardware-accelerated SHA-256.
+    hashlib is backed by OpenSSL, which dispatches to SHA-NI (x86) or the
+    ARMv8 crypto extensions at runtime when the CPU advertises them.
+    """
+    log.info("hashlib %s via %s", hashlib.sha256().name, ssl.OPENSSL_VERSION)
+    if ssl.OPENSSL_VERSION_INFO < (1, 1, 1):
+        log.warning("OpenSSL < 1.1.1 — SHA-256 may not use CPU SHA extensions")
+    try:
+        with open("/proc/cpuinfo") as fh:
+            flags = set(fh.read().split())
+    except OSError:
+        return  # not Linux — nothing to probe
+    if not flags & {"sha_ni", "sha2"}:
+        log.warning("CPU does not advertise sha_ni/sha2 — webhook HMAC runs "
+                    "on the slower generic SHA-256 path")
+
+
+def check_runtime_build(log: logging.Logger) -> None:
+    """
+    Startup self-check for the interpreter build and allocator.
+    A PGO/LTO-built CPython and a preloaded jemalloc/mimalloc noticeably help
+    the dict-heavy webhook and list-page parsing paths.
+    """
+    config_args = sysconfig.get_config_var("CONFIG_ARGS") or ""
+    pgo = "--enable-optimizations" in config_args
+    lto = "--with-lto" in config_args
+    log.info("CPython build  PGO=%s  LTO=%s", pgo, lto)
+    if not pgo:
+        log.warning("CPython was not built with --enable-optimizations (PGO)")
+
+    preload = os.getenv("LD_PRELOAD", "")
+    if "jemalloc" not in preload and "mimalloc" not in preload:
+        log.info("No jemalloc/mimalloc preloaded — using the system malloc")